@@ -1,7 +1,15 @@
+import aiohttp
 import discord
 from discord.ext import commands
 from discord import app_commands
 import os
+import asyncio
+import atexit
+import json
+import hashlib
+import logging
+import logging.handlers
+import queue
 from dotenv import load_dotenv
 from database.schema import Database
 
@@ -10,15 +18,18 @@ import pathlib
 env_path = pathlib.Path(__file__).parent / '.env'
 load_dotenv(dotenv_path=env_path)
 
+# Snapshot the environment once after .env is loaded; all config reads use it
+_ENV: dict[str, str] = dict(os.environ)
+
 # Bot configuration (validate required environment variables)
 def _get_env_str(name: str) -> str:
-    val = os.getenv(name)
+    val = _ENV.get(name)
     if not val:
         raise RuntimeError(f"Missing required environment variable: {name}")
     return val
 
 def _get_env_int(name: str) -> int:
-    raw = os.getenv(name)
+    raw = _ENV.get(name)
     if not raw:
         raise RuntimeError(f"Missing required environment variable: {name}")
     try:
@@ -35,7 +46,7 @@ except RuntimeError as e:
     raise SystemExit(1)
 
 # Optional multi-channel support
-def _parse_int_list(env_value: str) -> set[int]:
+def _parse_int_list(env_value: str) -> frozenset[int]:
     vals = set()
     for part in env_value.split(','):
         part = part.strip()
@@ -45,22 +56,47 @@ def _parse_int_list(env_value: str) -> set[int]:
             vals.add(int(part))
         except ValueError:
             print(f"[WARN] Skipping invalid channel id in ALLOWED_CHANNEL_IDS: {part!r}")
-    return vals
+    return frozenset(vals)
 
-ALLOWED_CHANNEL_IDS: set[int] | None = None
-raw_allowed = os.getenv('ALLOWED_CHANNEL_IDS')
+ALLOWED_CHANNEL_IDS: frozenset[int] | None = None
+raw_allowed = _ENV.get('ALLOWED_CHANNEL_IDS')
 if raw_allowed:
     parsed = _parse_int_list(raw_allowed)
     ALLOWED_CHANNEL_IDS = parsed if parsed else None
 else:
     # Legacy single-channel env var support (optional)
-    raw_legacy = os.getenv('YAP_CHANNEL_ID')
+    raw_legacy = _ENV.get('YAP_CHANNEL_ID')
     if raw_legacy:
         try:
-            ALLOWED_CHANNEL_IDS = {int(raw_legacy)}
+            ALLOWED_CHANNEL_IDS = frozenset({int(raw_legacy)})
         except ValueError:
             print(f"[WARN] Invalid YAP_CHANNEL_ID: {raw_legacy!r}")
 
+# Optional write-behind flush interval for buffered DB writes (milliseconds)
+DB_FLUSH_MS = 250
+raw_flush = _ENV.get('DB_FLUSH_MS')
+if raw_flush:
+    try:
+        DB_FLUSH_MS = int(raw_flush)
+    except ValueError:
+        print(f"[WARN] Invalid DB_FLUSH_MS: {raw_flush!r}")
+
+# Route the bot's own loggers through a queue so formatting and stderr writes
+# happen on a background thread instead of the event loop
+def _setup_logging():
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    stream = logging.StreamHandler()
+    stream.setFormatter(logging.Formatter("[%(levelname)s] %(name)s: %(message)s"))
+    listener = logging.handlers.QueueListener(log_queue, stream)
+    logger = logging.getLogger("engagement")
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    listener.start()
+    atexit.register(listener.stop)
+
+_setup_logging()
+
 # Configure intents
 intents = discord.Intents.default()
 intents.message_content = True  # Required to read message content
@@ -74,44 +110,86 @@ class EngagementBot(commands.Bot):
             intents=intents,
             application_id=None  # Bot application ID
         )
-        self.db = Database()
-        # Store allowed channels (None means all channels allowed)
-        self.allowed_channel_ids = ALLOWED_CHANNEL_IDS
+        self.db = Database(flush_ms=DB_FLUSH_MS)
+        # Store allowed channels (None means all channels allowed). Always a
+        # frozenset so updates are swapped in whole rather than mutated
+        self.allowed_channel_ids: frozenset[int] | None = ALLOWED_CHANNEL_IDS
         # Default log/report channels to None - configure via /set_log and /set_report commands
         self.log_channel_id = None
         self.report_channel_id = None
+        # session_id -> engager user_ids, filled lazily by /status and kept
+        # current by the reaction handler; only complete entries are stored
+        self.engagers_cache: dict[int, set[int]] = {}
+    async def login(self, token: str):
+        """Install a shared, keep-alive connector before discord.py opens its HTTP session"""
+        # Created here rather than in __init__ because aiohttp needs a running loop
+        self.http.connector = aiohttp.TCPConnector(limit=20, keepalive_timeout=60, ttl_dns_cache=300)
+        await super().login(token)
+
     async def setup_hook(self):
         """Called when bot is starting up"""
         # Connect to database
         await self.db.connect()
         print("✓ Database connected")
 
-        # Load runtime config overrides from DB (if any)
-        try:
-            cfg_allowed = await self.db.get_allowed_channel_ids()
-            if cfg_allowed is not None:
-                self.allowed_channel_ids = cfg_allowed
-                print(f"✓ Allowed channels loaded from DB: {sorted(self.allowed_channel_ids)}")
-            cfg_log = await self.db.get_config_int('log_channel_id')
-            if cfg_log:
-                self.log_channel_id = cfg_log
-                print(f"✓ Log channel loaded from DB: {self.log_channel_id}")
-            cfg_report = await self.db.get_config_int('report_channel_id')
-            if cfg_report:
-                self.report_channel_id = cfg_report
-                print(f"✓ Report channel loaded from DB: {self.report_channel_id}")
-        except Exception as e:
-            print(f"[WARN] Failed to load config from DB: {e}")
+        # Load runtime config overrides from DB (if any); reads are independent
+        cfg_allowed, cfg_log, cfg_report = await asyncio.gather(
+            self.db.get_allowed_channel_ids(),
+            self.db.get_config_int('log_channel_id'),
+            self.db.get_config_int('report_channel_id'),
+            return_exceptions=True,
+        )
+        for cfg in (cfg_allowed, cfg_log, cfg_report):
+            if isinstance(cfg, Exception):
+                print(f"[WARN] Failed to load config from DB: {cfg}")
+        if cfg_allowed is not None and not isinstance(cfg_allowed, Exception):
+            self.allowed_channel_ids = cfg_allowed
+            print(f"✓ Allowed channels loaded from DB: {sorted(self.allowed_channel_ids)}")
+        if cfg_log and not isinstance(cfg_log, Exception):
+            self.log_channel_id = cfg_log
+            print(f"✓ Log channel loaded from DB: {self.log_channel_id}")
+        if cfg_report and not isinstance(cfg_report, Exception):
+            self.report_channel_id = cfg_report
+            print(f"✓ Report channel loaded from DB: {self.report_channel_id}")
 
         # Load command cogs
-        await self.load_extension('commands.engagement')
-        await self.load_extension('commands.admin')
-        await self.load_extension('events.message_handler')
+        await asyncio.gather(
+            self.load_extension('commands.engagement'),
+            self.load_extension('commands.admin'),
+            self.load_extension('events.message_handler'),
+        )
         print("✓ Extensions loaded")
 
-        # Sync slash commands globally (works across all servers)
-        await self.tree.sync()
-        print("✓ Commands synced globally")
+        # Sync slash commands globally (works across all servers), skipping the
+        # REST call when the command tree is unchanged since the last sync
+        tree_hash = self._command_tree_hash()
+        if tree_hash != await self.db.get_config('cmd_tree_hash'):
+            await self.tree.sync()
+            await self.db.set_config('cmd_tree_hash', tree_hash)
+            print("✓ Commands synced globally")
+        else:
+            print("✓ Commands unchanged, skipping sync")
+
+    def _command_tree_hash(self) -> str:
+        """Return a stable hash of the global slash command payload"""
+        # Sort by name so the hash doesn't depend on extension load order
+        commands_ = sorted(self.tree.get_commands(), key=lambda cmd: cmd.name)
+        try:
+            payload = [cmd.to_dict(self.tree) for cmd in commands_]
+        except TypeError:
+            # discord.py < 2.4 takes no tree argument
+            payload = [cmd.to_dict() for cmd in commands_]
+        blob = json.dumps(payload, sort_keys=True).encode()
+        return hashlib.blake2b(blob, digest_size=16).hexdigest()
+
+    async def close(self):
+        """Flush buffered DB writes and close the database before disconnecting"""
+        if getattr(self.db, 'conn', None) is not None:
+            try:
+                await self.db.close()
+            except Exception as e:
+                print(f"[WARN] Failed to close database cleanly: {e}")
+        await super().close()
 
     async def on_ready(self):
         """Called when bot successfully connects to Discord"""
@@ -1,9 +1,27 @@
+import asyncio
 import discord
 from discord import app_commands
 from discord.ext import commands
 from typing import List, Tuple, Optional
 
 
+# Static embed templates; handlers send a .copy() so the originals stay untouched
+_ALL_CLEAR_EMBED = discord.Embed(
+	title="✅ All Clear!",
+	description="All creators have completed their engagement!",
+	color=discord.Color.green(),
+)
+_REPORT_EMBED = discord.Embed(
+	title="⚠️ Engagement Report",
+	description="The following creators still need to engage with others' content:",
+	color=discord.Color.red(),
+)
+_CONFIRM_RESET_EMBED = discord.Embed(
+	title="⚠️ Confirm Session Reset",
+	description="This will delete ALL current engagement data. Are you sure?",
+	color=discord.Color.red(),
+)
+
 class ConfirmResetView(discord.ui.View):
 	"""Confirmation view used to reset all session data."""
 
@@ -11,6 +29,19 @@ class ConfirmResetView(discord.ui.View):
 		super().__init__(timeout=30)
 		self.bot = bot
 
+	async def _safe_purge(self, cid: int, limiter: asyncio.Semaphore) -> bool:
+		"""Purge recent messages from a channel, returning True on success."""
+		ch = self.bot.get_channel(cid)
+		if ch is None:
+			return False
+		async with limiter:
+			try:
+				await ch.purge(limit=100)
+				return True
+			except Exception as e:
+				print(f"Error resetting channel {cid}: {str(e)}")
+				return False
+
 	@discord.ui.button(label="Confirm Reset", style=discord.ButtonStyle.danger)
 	async def confirm_button(self, interaction: discord.Interaction, button: discord.ui.Button):
 		# Only allow administrators to confirm
@@ -22,20 +53,16 @@ class ConfirmResetView(discord.ui.View):
 
 		# Reset all sessions in DB
 		await self.bot.db.reset_all_sessions()
+		self.bot.engagers_cache.clear()
 
 		# Optionally clear allowed channels (best-effort, but do NOT unlock)
 		channels_cleared = 0
 		allowed = getattr(self.bot, 'allowed_channel_ids', None)
 		if allowed:
-			for cid in list(allowed):
-				ch = self.bot.get_channel(cid)
-				if ch is None:
-					continue
-				try:
-					await ch.purge(limit=100)
-					channels_cleared += 1
-				except Exception as e:
-					print(f"Error resetting channel {cid}: {str(e)}")
+			# Purge channels concurrently, capped to stay clear of rate limits
+			limiter = asyncio.Semaphore(3)
+			results = await asyncio.gather(*(self._safe_purge(cid, limiter) for cid in list(allowed)))
+			channels_cleared = sum(results)
 
 		# Log the reset
 		log_channel = self.bot.get_channel(self.bot.log_channel_id)
@@ -70,11 +97,7 @@ class AdminCommands(commands.Cog):
 		# Get non-engaged users
 		non_engaged: List[Tuple[int, str]] = await self.bot.db.get_non_engaged_users()
 		if not non_engaged:
-			embed = discord.Embed(
-				title="✅ All Clear!",
-				description="All creators have completed their engagement!",
-				color=discord.Color.green(),
-			)
+			embed = _ALL_CLEAR_EMBED.copy()
 			await interaction.followup.send(embed=embed, ephemeral=True)
 			return
 
@@ -84,19 +107,13 @@ class AdminCommands(commands.Cog):
 			await interaction.followup.send("❌ Report channel not found. Check configuration.", ephemeral=True)
 			return
 
-		embed = discord.Embed(
-			title="⚠️ Engagement Report",
-			description="The following creators still need to engage with others' content:",
-			color=discord.Color.red(),
-		)
+		embed = _REPORT_EMBED.copy()
 
-		user_mentions: List[str] = []
-		for user_id, username in non_engaged:
-			user = self.bot.get_user(user_id)
-			if user:
-				user_mentions.append(user.mention)
-			else:
-				user_mentions.append(f"Unknown User ({user_id})")
+		get_user = self.bot.get_user
+		user_mentions: List[str] = [
+			u.mention if (u := get_user(user_id)) else f"Unknown User ({user_id})"
+			for user_id, _ in non_engaged
+		]
 
 		if user_mentions:
 			embed.add_field(
@@ -122,11 +139,7 @@ class AdminCommands(commands.Cog):
 	async def reset_session(self, interaction: discord.Interaction):
 		"""Clear all session data for a fresh start"""
 		view = ConfirmResetView(self.bot)
-		embed = discord.Embed(
-			title="⚠️ Confirm Session Reset",
-			description="This will delete ALL current engagement data. Are you sure?",
-			color=discord.Color.red(),
-		)
+		embed = _CONFIRM_RESET_EMBED.copy()
 		await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
 
 	@app_commands.command(name="set_yap_channel", description="Set or add the current channel as an allowed post channel")
@@ -135,40 +148,36 @@ class AdminCommands(commands.Cog):
 	@app_commands.checks.has_permissions(administrator=True)
 	async def set_yap_channel(self, interaction: discord.Interaction, add: bool = False):
 		"""Configure allowed channels for posting/reacting"""
-		await interaction.response.defer(ephemeral=True)
 		channel_id = interaction.channel_id
 		current = getattr(self.bot, 'allowed_channel_ids', None)
 		if add:
-			new_set = set(current) if current else set()
-			new_set.add(channel_id)
+			new_set = (current or frozenset()) | {channel_id}
 		else:
-			new_set = {channel_id}
+			new_set = frozenset({channel_id})
 		# Persist and apply
 		await self.bot.db.set_allowed_channel_ids(new_set)
 		self.bot.allowed_channel_ids = new_set
 		name = interaction.channel.mention if isinstance(interaction.channel, discord.abc.GuildChannel) else str(channel_id)
 		verb = "added to" if add else "set as"
-		await interaction.followup.send(f"✅ {name} {verb} allowed channels.", ephemeral=True)
+		await interaction.response.send_message(f"✅ {name} {verb} allowed channels.", ephemeral=True)
 
 	@app_commands.command(name="set_log", description="Set the log channel (default: current channel)")
 	@app_commands.default_permissions(administrator=True)
 	@app_commands.checks.has_permissions(administrator=True)
 	async def set_log(self, interaction: discord.Interaction, channel: Optional[discord.TextChannel] = None):
-		await interaction.response.defer(ephemeral=True)
 		ch = channel or interaction.channel
 		await self.bot.db.set_config('log_channel_id', str(ch.id))
 		self.bot.log_channel_id = ch.id
-		await interaction.followup.send(f"✅ Log channel set to {ch.mention}", ephemeral=True)
+		await interaction.response.send_message(f"✅ Log channel set to {ch.mention}", ephemeral=True)
 
 	@app_commands.command(name="set_report", description="Set the report channel (default: current channel)")
 	@app_commands.default_permissions(administrator=True)
 	@app_commands.checks.has_permissions(administrator=True)
 	async def set_report(self, interaction: discord.Interaction, channel: Optional[discord.TextChannel] = None):
-		await interaction.response.defer(ephemeral=True)
 		ch = channel or interaction.channel
 		await self.bot.db.set_config('report_channel_id', str(ch.id))
 		self.bot.report_channel_id = ch.id
-		await interaction.followup.send(f"✅ Report channel set to {ch.mention}", ephemeral=True)
+		await interaction.response.send_message(f"✅ Report channel set to {ch.mention}", ephemeral=True)
 
 
 async def setup(bot: commands.Bot):
@@ -1,3 +1,4 @@
+import asyncio
 import discord
 from discord import app_commands
 from discord.ext import commands
@@ -5,6 +6,37 @@ import re
 from typing import Optional
 
 
+# Simple URL validation, compiled once at import
+_URL_RE = re.compile(r"^https?://\S+$")
+
+_MEDALS = ("🥇", "🥈", "🥉")
+_POINT_LABEL = {1: "1 point"}
+
+
+def _point_label(points: int) -> str:
+    return _POINT_LABEL.get(points) or f"{points} points"
+
+# Status embed color indexed by "everyone has engaged"
+_STATUS_COLORS = (discord.Color.yellow(), discord.Color.green())
+
+# Static embed templates; handlers send a .copy() so the originals stay untouched
+_NO_SESSION_EMBED = discord.Embed(
+    title="📊 Engagement Status",
+    description="You haven't submitted a link yet for this session.",
+    color=discord.Color.orange(),
+)
+_EMPTY_LEADERBOARD_EMBED = discord.Embed(
+    title="🏆 Engagement Leaderboard",
+    description="No engagement data yet. Start engaging to appear here!",
+    color=discord.Color.blue(),
+)
+_LEADERBOARD_EMBED = discord.Embed(
+    title="🏆 Engagement Leaderboard",
+    description="Top creators by engagement points",
+    color=discord.Color.gold(),
+).set_footer(text="Keep engaging to climb the ranks!")
+
+
 class EngagementCommands(commands.Cog):
     """Cog that provides engagement-related slash commands."""
 
@@ -19,25 +51,29 @@ class EngagementCommands(commands.Cog):
         # Get user's active session
         session = await self.bot.db.get_active_session(user_id)
         if not session:
-            embed = discord.Embed(
-                title="📊 Engagement Status",
-                description="You haven't submitted a link yet for this session.",
-                color=discord.Color.orange(),
-            )
+            embed = _NO_SESSION_EMBED.copy()
             await interaction.response.send_message(embed=embed, ephemeral=True)
             return
 
         # Build numeric status: engaged_count / total_others
-        latest_map = await self.bot.db.get_latest_sessions_map()
-        # Everyone who currently has an active/latest session
-        all_user_ids = set(latest_map.keys())
-        # Others (exclude self)
-        other_user_ids = sorted(uid for uid in all_user_ids if uid != user_id)
+        session_id = session["session_id"]
+        engaged_set = self.bot.engagers_cache.get(session_id)
+        if engaged_set is None:
+            # Cache miss: both reads are independent, so issue them together
+            latest_map, engagers = await asyncio.gather(
+                self.bot.db.get_latest_sessions_map(),
+                self.bot.db.get_engagers_for_session(session_id),
+            )
+            engaged_set = self.bot.engagers_cache.setdefault(session_id, set())
+            engaged_set.update(engagers)
+        else:
+            latest_map = await self.bot.db.get_latest_sessions_map()
+        # Everyone else who currently has an active/latest session
+        other_user_ids_set = latest_map.keys() - {user_id}
+        other_user_ids = sorted(other_user_ids_set)
         total_required = len(other_user_ids)
 
-        engagers = await self.bot.db.get_engagers_for_session(session["session_id"])
-        engaged_set = set(engagers)
-        engaged_count = len(engaged_set.intersection(all_user_ids - {user_id}))
+        engaged_count = len(engaged_set & other_user_ids_set)
 
         # Compute who hasn't engaged with your tweet (among other active users)
         pending_ids = [uid for uid in other_user_ids if uid not in engaged_set]
@@ -45,7 +81,7 @@ class EngagementCommands(commands.Cog):
         # Prepare embed
         embed = discord.Embed(
             title="📊 Engagement Status",
-            color=discord.Color.green() if engaged_count >= total_required and total_required > 0 else discord.Color.yellow(),
+            color=_STATUS_COLORS[total_required > 0 and engaged_count >= total_required],
         )
         embed.add_field(name="Your Link", value=session["link"], inline=False)
         embed.add_field(name="Status", value=f"{engaged_count}/{total_required}", inline=True)
@@ -53,10 +89,8 @@ class EngagementCommands(commands.Cog):
         # Resolve mentions for pending users
         if total_required > 0:
             if pending_ids:
-                mentions = []
-                for uid in pending_ids:
-                    user = self.bot.get_user(uid)
-                    mentions.append(user.mention if user else f"<@{uid}>")
+                get_user = self.bot.get_user
+                mentions = [u.mention if (u := get_user(uid)) else f"<@{uid}>" for uid in pending_ids]
                 pending_value = "\n".join(mentions)
             else:
                 pending_value = "Everyone has engaged with your post. 🎉"
@@ -67,30 +101,19 @@ class EngagementCommands(commands.Cog):
     @app_commands.command(name="leaderboard", description="Display engagement leaderboard")
     async def leaderboard(self, interaction: discord.Interaction):
         """Show top engagers"""
-        leaders = await self.bot.db.get_leaderboard(limit=10)
-        if not leaders:
-            embed = discord.Embed(
-                title="🏆 Engagement Leaderboard",
-                description="No engagement data yet. Start engaging to appear here!",
-                color=discord.Color.blue(),
-            )
+        _, names, points = await self.bot.db.get_leaderboard_arrays(limit=10)
+        if not names:
+            embed = _EMPTY_LEADERBOARD_EMBED.copy()
             await interaction.response.send_message(embed=embed)
             return
 
         # Build leaderboard embed
-        embed = discord.Embed(
-            title="🏆 Engagement Leaderboard",
-            description="Top creators by engagement points",
-            color=discord.Color.gold(),
-        )
-        medals = ["🥇", "🥈", "🥉"]
-        leaderboard_text = ""
-        for idx, (user_id, username, points) in enumerate(leaders, 1):
-            medal = medals[idx - 1] if idx <= 3 else f"`#{idx}`"
-            leaderboard_text += f"{medal} **{username}** - {points} point{'s' if points != 1 else ''}\n"
-
-        embed.description = leaderboard_text
-        embed.set_footer(text="Keep engaging to climb the ranks!")
+        embed = _LEADERBOARD_EMBED.copy()
+        lines = [
+            f"{_MEDALS[idx - 1] if idx <= 3 else f'`#{idx}`'} **{name}** - {_point_label(pts)}"
+            for idx, (name, pts) in enumerate(zip(names, points), 1)
+        ]
+        embed.description = "\n".join(lines)
         await interaction.response.send_message(embed=embed)
 
     @app_commands.command(name="change_link", description="Update your submitted link")
@@ -99,9 +122,7 @@ class EngagementCommands(commands.Cog):
         """Allow users to change their link with notification"""
         user_id = interaction.user.id
 
-        # Simple URL validation
-        url_pattern = re.compile(r"^https?://\S+$")
-        if not url_pattern.match(new_link):
+        if not _URL_RE.match(new_link):
             await interaction.response.send_message(
                 "❌ Invalid URL format. Please provide a valid link starting with http:// or https://",
                 ephemeral=True,
@@ -152,15 +173,7 @@ class EngagementCommands(commands.Cog):
                 await log_channel.send(embed=log_embed)
 
             # Update database
-            await self.bot.db.conn.execute(
-                """
-                UPDATE sessions
-                SET link = ?
-                WHERE session_id = ?
-                """,
-                (new_link, session["session_id"]),
-            )
-            await self.bot.db.conn.commit()
+            await self.bot.db.update_session_link(session["session_id"], new_link)
 
             await interaction.response.send_message(
                 "✅ Link updated successfully! Others have been notified.", ephemeral=True
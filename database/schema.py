@@ -1,14 +1,43 @@
 import aiosqlite
 import asyncio
+import time
 from typing import Optional
 
+# How long get_latest_sessions_map results may be served from memory (seconds)
+LATEST_SESSIONS_TTL = 2.0
+
+# Shared SQL text so sqlite3's per-connection statement cache is hit on every flush
+_UPDATE_SESSION_LINK_SQL = "UPDATE sessions SET link = ? WHERE session_id = ?"
+
 class Database:
-    def __init__(self, db_path: str = "engagement.db"):
+    def __init__(self, db_path: str = "engagement.db", flush_ms: int = 250, flush_batch: int = 50):
         self.db_path = db_path
+        # Write-behind buffer for session link updates (session_id -> link)
+        self.flush_interval = flush_ms / 1000
+        self.flush_batch = flush_batch
+        self._pending_links: dict[int, str] = {}
+        self._flush_task: Optional[asyncio.Task] = None
+        # Cached (timestamp, value) for get_latest_sessions_map
+        self._lsm_cache: Optional[tuple[float, dict[int, int]]] = None
+        self._lsm_lock = asyncio.Lock()
+        # Config values by key (None = known missing); kept in sync by the setters
+        self._config_cache: dict[str, Optional[str]] = {}
+        # Last parsed allowed_channel_ids as (raw csv, parsed ids)
+        self._allowed_ids_cache: Optional[tuple[str, Optional[frozenset[int]]]] = None
 
     async def connect(self):
         """Initialize database connection and create tables"""
         self.conn = await aiosqlite.connect(self.db_path)
+        # WAL + NORMAL sync turns each commit into a WAL append instead of a journal fsync
+        for pragma in (
+            "PRAGMA journal_mode=WAL",
+            "PRAGMA synchronous=NORMAL",
+            "PRAGMA temp_store=MEMORY",
+            "PRAGMA cache_size=-64000",
+            "PRAGMA mmap_size=268435456",
+            "PRAGMA busy_timeout=5000",
+        ):
+            await self.conn.execute(pragma)
         await self.create_tables()
 
     async def create_tables(self):
@@ -22,6 +51,10 @@ class Database:
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         )
         """)
+        # Lets get_leaderboard walk the top N in index order instead of sorting all users
+        await self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_users_points ON users(total_points DESC)"
+        )
 
         # Sessions table - tracks engagement sessions
         await self.conn.execute("""
@@ -35,6 +68,14 @@ class Database:
             FOREIGN KEY (user_id) REFERENCES users (user_id)
         )
         """)
+        # Reactions resolve their session by the bot's posted message id
+        await self.conn.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS idx_sessions_message_id ON sessions(message_id)"
+        )
+        # Serves "latest session for user" lookups in get_active_session
+        await self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_sessions_user_submitted ON sessions(user_id, submitted_at DESC)"
+        )
 
         # Engagement table - tracks who engaged with whom
         await self.conn.execute("""
@@ -47,23 +88,61 @@ class Database:
             FOREIGN KEY (target_session_id) REFERENCES sessions (session_id)
         )
         """)
-        await self.conn.commit()
+        # One engagement per (engager, target) pair. The first time the unique index
+        # is built, drop duplicates left by older versions and the non-unique
+        # index it replaces
+        cursor = await self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'uq_eng_engager_target'"
+        )
+        if await cursor.fetchone() is None:
+            await self.conn.execute("""
+            DELETE FROM engagements
+            WHERE engagement_id NOT IN (
+                SELECT MIN(engagement_id) FROM engagements
+                GROUP BY engager_id, target_session_id
+            )
+            """)
+            await self.conn.execute("DROP INDEX IF EXISTS idx_eng_engager_target")
+            await self.conn.execute(
+                "CREATE UNIQUE INDEX uq_eng_engager_target ON engagements(engager_id, target_session_id)"
+            )
+        # Serves get_engagers_for_session (filter by target, ordered by time)
+        await self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_eng_target ON engagements(target_session_id, engaged_at)"
+        )
         # Ensure sessions has channel_id column for multi-channel support
-        try:
+        cursor = await self.conn.execute("PRAGMA table_info(sessions)")
+        columns = {row[1] for row in await cursor.fetchall()}
+        if "channel_id" not in columns:
             await self.conn.execute("ALTER TABLE sessions ADD COLUMN channel_id INTEGER")
-            await self.conn.commit()
-        except Exception:
-            # Column likely already exists; ignore
-            pass
 
-        # Config table - simple key/value store for runtime configuration
+        # Config table - simple key/value store for runtime configuration.
+        # WITHOUT ROWID keeps rows in the key's B-tree instead of a separate rowid tree
         await self.conn.execute("""
         CREATE TABLE IF NOT EXISTS configs (
             key TEXT PRIMARY KEY,
             value TEXT NOT NULL
-        )
+        ) WITHOUT ROWID
         """)
+        # Rebuild configs tables created before WITHOUT ROWID (can't be ALTERed in)
+        cursor = await self.conn.execute("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'configs'")
+        row = await cursor.fetchone()
+        if row and "WITHOUT ROWID" not in row[0].upper():
+            await self.conn.executescript("""
+            BEGIN;
+            CREATE TABLE configs_new (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            ) WITHOUT ROWID;
+            INSERT INTO configs_new (key, value) SELECT key, value FROM configs;
+            DROP TABLE configs;
+            ALTER TABLE configs_new RENAME TO configs;
+            COMMIT;
+            """)
+        # Refresh planner statistics so the indexes above are chosen
+        await self.conn.execute("ANALYZE")
         await self.conn.commit()
+
     async def add_user(self, user_id: int, username: str):
         """Add a new user or update existing username"""
         await self.conn.execute("""
@@ -80,6 +159,7 @@ class Database:
         VALUES (?, ?, ?, ?)
         """, (user_id, link, message_id, channel_id))
         await self.conn.commit()
+        self._lsm_cache = None
         return cursor.lastrowid
 
     async def get_active_session(self, user_id: int) -> Optional[dict]:
@@ -92,28 +172,37 @@ class Database:
         LIMIT 1
         """, (user_id,))
         row = await cursor.fetchone()
-        if row:
-            return {
-                "session_id": row[0],
-                "link": row[1],
-                "message_id": row[2],
-                "engaged": bool(row[3]),
-                "user_id": row[4],
-                "channel_id": row[5]
-            }
-        return None
-    async def mark_engaged(self, user_id: int):
-        """Mark user as having completed engagement"""
+        return self._session_from_row(row) if row else None
+
+    async def get_session_by_message_id(self, message_id: int) -> Optional[dict]:
+        """Get the session whose formatted post has the given message id"""
+        cursor = await self.conn.execute("""
+        SELECT session_id, link, message_id, engaged, user_id, channel_id
+        FROM sessions
+        WHERE message_id = ?
+        LIMIT 1
+        """, (message_id,))
+        row = await cursor.fetchone()
+        return self._session_from_row(row) if row else None
+
+    def _session_from_row(self, row) -> dict:
+        return {
+            "session_id": row[0],
+            # Prefer a queued link update that hasn't been flushed yet
+            "link": self._pending_links.get(row[0], row[1]),
+            "message_id": row[2],
+            "engaged": bool(row[3]),
+            "user_id": row[4],
+            "channel_id": row[5]
+        }
+
+    async def mark_engaged(self, session_id: int):
+        """Mark a session (from get_active_session) as having completed engagement"""
         await self.conn.execute("""
         UPDATE sessions
         SET engaged = TRUE
-        WHERE user_id = ? AND session_id = (
-            SELECT session_id FROM sessions
-            WHERE user_id = ?
-            ORDER BY submitted_at DESC
-            LIMIT 1
-        )
-        """, (user_id, user_id))
+        WHERE session_id = ?
+        """, (session_id,))
         await self.conn.commit()
 
     async def has_engaged(self, engager_id: int, target_session_id: int) -> bool:
@@ -127,15 +216,32 @@ class Database:
 
     async def add_engagement(self, engager_id: int, target_session_id: int) -> bool:
         """Record an engagement action if it doesn't exist already"""
-        if await self.has_engaged(engager_id, target_session_id):
-            return False
-            
-        await self.conn.execute("""
-        INSERT INTO engagements (engager_id, target_session_id)
+        # The unique (engager_id, target_session_id) index rejects duplicates
+        cursor = await self.conn.execute("""
+        INSERT OR IGNORE INTO engagements (engager_id, target_session_id)
+        VALUES (?, ?)
+        """, (engager_id, target_session_id))
+        await self.conn.commit()
+        return cursor.rowcount == 1
+
+    async def record_engagement_and_point(self, engager_id: int, target_session_id: int) -> bool:
+        """Record an engagement and award the engager a point in one transaction.
+
+        Returns False without awarding anything if the engagement already exists.
+        """
+        cursor = await self.conn.execute("""
+        INSERT OR IGNORE INTO engagements (engager_id, target_session_id)
         VALUES (?, ?)
         """, (engager_id, target_session_id))
+        inserted = cursor.rowcount == 1
+        if inserted:
+            await self.conn.execute("""
+            UPDATE users
+            SET total_points = total_points + 1
+            WHERE user_id = ?
+            """, (engager_id,))
         await self.conn.commit()
-        return True
+        return inserted
 
     async def add_point(self, user_id: int):
         """Add a point to user's total"""
@@ -156,54 +262,82 @@ class Database:
         """, (limit,))
         return await cursor.fetchall()
 
+    async def get_leaderboard_arrays(self, limit: int = 10) -> tuple[list[int], list[str], list[int]]:
+        """Get top users by points as parallel (user_ids, usernames, points) lists"""
+        rows = await self.get_leaderboard(limit)
+        if not rows:
+            return [], [], []
+        ids, names, points = zip(*rows)
+        return list(ids), list(names), list(points)
+
     async def get_non_engaged_users(self):
         """Get users who have not engaged with every other user's most recent content link."""
-        # Get all users with a current session
+        # Pair every user's latest session against every other user's and keep
+        # the engagers with at least one missing engagement, in a single query
         cursor = await self.conn.execute('''
-            SELECT user_id, session_id FROM (
-                SELECT user_id, MAX(session_id) as session_id
+            WITH latest(user_id, session_id) AS (
+                SELECT user_id, MAX(session_id)
                 FROM sessions
                 GROUP BY user_id
             )
+            SELECT u.user_id, users.username
+            FROM latest u
+            JOIN latest v ON v.user_id <> u.user_id
+            LEFT JOIN engagements e
+                ON e.engager_id = u.user_id AND e.target_session_id = v.session_id
+            LEFT JOIN users ON users.user_id = u.user_id
+            WHERE e.engagement_id IS NULL
+            GROUP BY u.user_id
+            ORDER BY u.user_id
         ''')
-        user_sessions = await cursor.fetchall()
-        user_ids = [row[0] for row in user_sessions]
-        session_map = {row[0]: row[1] for row in user_sessions}
-
-        non_engaged_users = []
-        for user_id in user_ids:
-            # For each user, check if they have engaged with every other user's most recent session
-            missing = False
-            for other_id in user_ids:
-                if other_id == user_id:
-                    continue
-                # Check if user_id has engaged with other_id's latest session
-                cursor = await self.conn.execute('''
-                    SELECT COUNT(*) FROM engagements
-                    WHERE engager_id = ? AND target_session_id = ?
-                ''', (user_id, session_map[other_id]))
-                count = await cursor.fetchone()
-                if count[0] == 0:
-                    missing = True
-                    break
-            if missing:
-                # Get username
-                cursor = await self.conn.execute('SELECT username FROM users WHERE user_id = ?', (user_id,))
-                row = await cursor.fetchone()
-                username = row[0] if row else str(user_id)
-                non_engaged_users.append((user_id, username))
-        return non_engaged_users
+        rows = await cursor.fetchall()
+        return [(user_id, username if username is not None else str(user_id)) for user_id, username in rows]
 
     async def reset_all_sessions(self):
         """Delete all session data for a fresh start"""
+        self._pending_links.clear()
         await self.conn.execute("DELETE FROM sessions")
         await self.conn.execute("DELETE FROM engagements")
         await self.conn.commit()
+        self._lsm_cache = None
 
     async def close(self):
         """Close database connection"""
+        if self._flush_task is not None and not self._flush_task.done():
+            self._flush_task.cancel()
+        await self.flush_link_updates()
         await self.conn.close()
 
+    # ---------- Buffered Session Writes ----------
+    async def update_session_link(self, session_id: int, link: str):
+        """Queue a link change for a session; writes are flushed in batches"""
+        self._pending_links[session_id] = link
+        if len(self._pending_links) >= self.flush_batch:
+            await self.flush_link_updates()
+        elif self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._delayed_flush())
+
+    async def _delayed_flush(self):
+        await asyncio.sleep(self.flush_interval)
+        try:
+            await self.flush_link_updates()
+        except Exception as e:
+            print(f"[WARN] Failed to flush session link updates: {e}")
+
+    async def flush_link_updates(self):
+        """Write all queued link updates in a single transaction"""
+        if not self._pending_links:
+            return
+        pending = dict(self._pending_links)
+        batch = [(link, session_id) for session_id, link in pending.items()]
+        await self.conn.executemany(_UPDATE_SESSION_LINK_SQL, batch)
+        await self.conn.commit()
+        # Drop only what was written; on failure the queue is kept for the next flush,
+        # and links queued again during the write stay pending
+        for session_id, link in pending.items():
+            if self._pending_links.get(session_id) == link:
+                del self._pending_links[session_id]
+
     # ---------- Configuration Helpers ----------
     async def set_config(self, key: str, value: str):
         await self.conn.execute(
@@ -215,11 +349,16 @@ class Database:
             (key, value),
         )
         await self.conn.commit()
+        self._config_cache[key] = value
 
     async def get_config(self, key: str) -> Optional[str]:
+        if key in self._config_cache:
+            return self._config_cache[key]
         cursor = await self.conn.execute("SELECT value FROM configs WHERE key = ?", (key,))
         row = await cursor.fetchone()
-        return row[0] if row else None
+        val = row[0] if row else None
+        self._config_cache[key] = val
+        return val
 
     async def get_config_int(self, key: str) -> Optional[int]:
         val = await self.get_config(key)
@@ -230,10 +369,13 @@ class Database:
         except ValueError:
             return None
 
-    async def get_allowed_channel_ids(self) -> Optional[set[int]]:
+    async def get_allowed_channel_ids(self) -> Optional[frozenset[int]]:
         val = await self.get_config('allowed_channel_ids')
         if not val:
             return None
+        cached = self._allowed_ids_cache
+        if cached is not None and cached[0] == val:
+            return cached[1]
         parts = [p.strip() for p in val.split(',') if p.strip()]
         ids: set[int] = set()
         for p in parts:
@@ -241,29 +383,46 @@ class Database:
                 ids.add(int(p))
             except ValueError:
                 continue
-        return ids if ids else None
+        parsed = frozenset(ids) if ids else None
+        self._allowed_ids_cache = (val, parsed)
+        return parsed
 
-    async def set_allowed_channel_ids(self, ids: Optional[set[int]]):
+    async def set_allowed_channel_ids(self, ids: Optional[frozenset[int]]):
         if not ids:
             # Remove config to indicate "all channels allowed"
             await self.conn.execute("DELETE FROM configs WHERE key = 'allowed_channel_ids'")
             await self.conn.commit()
+            self._config_cache['allowed_channel_ids'] = None
             return
         csv = ",".join(str(i) for i in sorted(ids))
         await self.set_config('allowed_channel_ids', csv)
 
     # ---------- Engagement Status Helpers ----------
     async def get_latest_sessions_map(self) -> dict[int, int]:
-        """Return mapping of user_id -> latest session_id for all users with at least one session."""
-        cursor = await self.conn.execute(
-            """
-            SELECT user_id, MAX(session_id) AS latest_session
-            FROM sessions
-            GROUP BY user_id
-            """
-        )
-        rows = await cursor.fetchall()
-        return {row[0]: row[1] for row in rows}
+        """Return mapping of user_id -> latest session_id for all users with at least one session.
+
+        Results are cached for LATEST_SESSIONS_TTL seconds and invalidated when sessions
+        are added or reset. The returned dict is shared and must not be mutated.
+        """
+        cached = self._lsm_cache
+        if cached is not None and time.monotonic() - cached[0] < LATEST_SESSIONS_TTL:
+            return cached[1]
+        async with self._lsm_lock:
+            # Another caller may have refreshed the cache while we waited
+            cached = self._lsm_cache
+            if cached is not None and time.monotonic() - cached[0] < LATEST_SESSIONS_TTL:
+                return cached[1]
+            cursor = await self.conn.execute(
+                """
+                SELECT user_id, MAX(session_id) AS latest_session
+                FROM sessions
+                GROUP BY user_id
+                """
+            )
+            rows = await cursor.fetchall()
+            value = {row[0]: row[1] for row in rows}
+            self._lsm_cache = (time.monotonic(), value)
+            return value
 
     async def get_engagers_for_session(self, session_id: int) -> list[int]:
         """Return list of user_ids who engaged with the given session."""
@@ -1,21 +1,158 @@
+import asyncio
+import logging
 import discord
 from discord.ext import commands
 import re
 from typing import Optional
 
 
+# Handlers are attached at startup (see bot.py) and write from a background thread
+logger = logging.getLogger("engagement.messages")
+
+# Simple URL detection, compiled once at import
+_URL_RE = re.compile(r"https?://\S+")
+
+# Seconds to collect reactions on a post before editing its "Engaged By" field
+EMBED_FLUSH_DELAY = 1.0
+# Discord's maximum length for an embed field value
+_FIELD_VALUE_LIMIT = 1024
+_MORE_RE = re.compile(r"…and (\d+) more")
+
+# Seconds to collect log embeds before sending them to the log channel
+LOG_FLUSH_DELAY = 2.0
+# Discord allows up to 10 embeds and 6000 embed characters per message
+_MAX_EMBEDS_PER_MESSAGE = 10
+_MAX_EMBED_CHARS_PER_MESSAGE = 6000
+
+
+def _engaged_by_value(current: str, new_mentions: list[str]) -> str:
+    """Append mentions to an "Engaged By" value, collapsing overflow into a trailing count."""
+    lines = current.split("\n") if current else []
+    hidden = 0
+    if lines and (more := _MORE_RE.fullmatch(lines[-1])):
+        hidden = int(more.group(1))
+        lines.pop()
+    if hidden:
+        # Already over the limit; new engagers only add to the count
+        hidden += len(new_mentions)
+    else:
+        lines.extend(new_mentions)
+    while lines and len("\n".join(lines + ([f"…and {hidden} more"] if hidden else []))) > _FIELD_VALUE_LIMIT:
+        lines.pop()
+        hidden += 1
+    return "\n".join(lines + ([f"…and {hidden} more"] if hidden else []))
+
+
 class MessageHandler(commands.Cog):
     """Handles messages and reactions in the Yap channel."""
 
+    # Constant parts of the link submission embed
+    _SUBMISSION_COLOR = discord.Color.blue()
+    _INSTRUCTIONS_FIELD = {
+        "name": "Instructions",
+        "value": "React with ✅ after engaging with this content to show support!",
+        "inline": False,
+    }
+
     def __init__(self, bot: commands.Bot):
         self.bot = bot
         self.checkmark_emoji = "✅"
+        # message_id -> engager mentions not yet written to that post's embed
+        self._pending_embed_updates: dict[int, list[str]] = {}
+        # message_id -> running flush task for that post
+        self._embed_flush_tasks: dict[int, asyncio.Task] = {}
+        # Log embeds waiting to be sent to the log channel in batches
+        self._log_buffer: list[discord.Embed] = []
+        self._log_flush_task: Optional[asyncio.Task] = None
 
     async def _get_all_user_ids(self, guild: discord.Guild):
         """Helper to get all user IDs from a guild."""
         async for member in guild.fetch_members():
             yield member.id
 
+    def _enqueue_log(self, embed: discord.Embed):
+        """Buffer a log embed; a debounced task sends buffered embeds together."""
+        self._log_buffer.append(embed)
+        if self._log_flush_task is None or self._log_flush_task.done():
+            self._log_flush_task = asyncio.create_task(self._flush_logs())
+
+    async def _flush_logs(self):
+        while self._log_buffer:
+            await asyncio.sleep(LOG_FLUSH_DELAY)
+            buffered, self._log_buffer = self._log_buffer, []
+            log_channel = self.bot.get_channel(self.bot.log_channel_id)
+            if log_channel is None:
+                continue
+            # Pack as many embeds into each message as Discord allows
+            batch: list[discord.Embed] = []
+            size = 0
+            for embed in buffered:
+                if batch and (len(batch) == _MAX_EMBEDS_PER_MESSAGE or size + len(embed) > _MAX_EMBED_CHARS_PER_MESSAGE):
+                    await self._send_log_batch(log_channel, batch)
+                    batch, size = [], 0
+                batch.append(embed)
+                size += len(embed)
+            if batch:
+                await self._send_log_batch(log_channel, batch)
+
+    async def _send_log_batch(self, log_channel: discord.abc.Messageable, embeds: list[discord.Embed]):
+        try:
+            await log_channel.send(embeds=embeds)
+        except Exception as e:
+            logger.warning("Error sending %d log embed(s): %s", len(embeds), e)
+
+    def _channel_allowed(self, channel_id: int) -> bool:
+        """True if the channel may be used (None means all channels are allowed)."""
+        allowed = self.bot.allowed_channel_ids
+        return allowed is None or channel_id in allowed
+
+    def _queue_embed_update(self, channel: discord.abc.Messageable, message_id: int, mention: str):
+        """Queue an engager mention; one task per post coalesces them into few edits."""
+        self._pending_embed_updates.setdefault(message_id, []).append(mention)
+        if message_id not in self._embed_flush_tasks:
+            self._embed_flush_tasks[message_id] = asyncio.create_task(self._flush_embed(channel, message_id))
+
+    async def _flush_embed(self, channel: discord.abc.Messageable, message_id: int):
+        try:
+            while message_id in self._pending_embed_updates:
+                await asyncio.sleep(EMBED_FLUSH_DELAY)
+                mentions = self._pending_embed_updates.pop(message_id)
+                try:
+                    # Re-fetch so we build on the latest embed rather than a stale copy
+                    message = await channel.fetch_message(message_id)
+                    if not message.embeds:
+                        continue
+                    embed = message.embeds[0]
+                    # Find existing engagements field or create new one
+                    engagement_index = -1
+                    for i, field in enumerate(embed.fields):
+                        if field.name == "Engaged By":
+                            engagement_index = i
+                            break
+
+                    if engagement_index >= 0:
+                        # Update existing field
+                        new_value = _engaged_by_value(embed.fields[engagement_index].value, mentions)
+                        embed.set_field_at(engagement_index, name="Engaged By", value=new_value, inline=False)
+                    else:
+                        # Add new field
+                        embed.add_field(name="Engaged By", value=_engaged_by_value("", mentions), inline=False)
+
+                    await message.edit(embed=embed)
+                except Exception as e:
+                    logger.warning("Error updating engagement post: %s", e)
+        finally:
+            self._embed_flush_tasks.pop(message_id, None)
+
+    async def _reject_message(self, message: discord.Message, warning: str):
+        """Delete a rejected message and post a short-lived warning, concurrently."""
+        # Channel messages can't be ephemeral, so the warning self-deletes instead
+        await asyncio.gather(
+            message.delete(),
+            message.channel.send(f"{message.author.mention} {warning}", delete_after=5),
+            return_exceptions=True,
+        )
+
     @commands.Cog.listener()
     async def on_message(self, message: discord.Message):
         try:
@@ -24,38 +161,24 @@ class MessageHandler(commands.Cog):
                 return
 
             # Only process messages in allowed channels (if configured)
-            allowed = getattr(self.bot, 'allowed_channel_ids', None)
-            if allowed is not None and message.channel.id not in allowed:
+            if not self._channel_allowed(message.channel.id):
                 return
 
-            # Simple URL detection
-            url_pattern = re.compile(r"https?://\S+")
-            urls = url_pattern.findall(message.content)
-            if not urls:
+            # Only the first URL is used, so stop scanning at the first match
+            url_match = _URL_RE.search(message.content)
+            if url_match is None:
                 # No URL found, delete message and warn
-                try:
-                    await message.delete()
-                except Exception:
-                    pass
-                await message.channel.send(
-                    f"{message.author.mention} Please post only links in this channel!",
-                    delete_after=5,
-                )
+                await self._reject_message(message, "Please post only links in this channel!")
                 return
 
-            link = urls[0]  # Take first URL
+            link = url_match.group(0)
 
             # Check if user already has an active session
             existing_session = await self.bot.db.get_active_session(message.author.id)
             if existing_session:
                 # User already posted, delete new message and notify
-                try:
-                    await message.delete()
-                except Exception:
-                    pass
-                await message.channel.send(
-                    f"{message.author.mention} You can only post 1 link per session! Use `/change_link` to update.",
-                    delete_after=5,
+                await self._reject_message(
+                    message, "You can only post 1 link per session! Use `/change_link` to update."
                 )
                 return
 
@@ -72,14 +195,10 @@ class MessageHandler(commands.Cog):
             embed = discord.Embed(
                 title=f"🔗 {message.author.display_name}'s Content",
                 description=f"[Click here to engage]({link})",
-                color=discord.Color.blue(),
+                color=self._SUBMISSION_COLOR,
             )
             embed.set_thumbnail(url=message.author.display_avatar.url)
-            embed.add_field(
-                name="Instructions",
-                value="React with ✅ after engaging with this content to show support!",
-                inline=False,
-            )
+            embed.add_field(**self._INSTRUCTIONS_FIELD)
             embed.set_footer(text=f"Posted by {message.author.display_name}")
 
             # Send formatted message
@@ -92,7 +211,9 @@ class MessageHandler(commands.Cog):
                 pass
 
             # Save to database (store channel id for multi-channel support)
-            await self.bot.db.add_session(message.author.id, link, formatted_msg.id, message.channel.id)
+            session_id = await self.bot.db.add_session(message.author.id, link, formatted_msg.id, message.channel.id)
+            # A fresh session has no engagers yet, so its cache entry is complete
+            self.bot.engagers_cache[session_id] = set()
 
             # Log submission
             log_channel = self.bot.get_channel(self.bot.log_channel_id)
@@ -103,11 +224,9 @@ class MessageHandler(commands.Cog):
                     color=discord.Color.green(),
                 )
                 log_embed.add_field(name="Link", value=link, inline=False)
-                await log_channel.send(embed=log_embed)
-        except Exception as e:
-            print(f"[on_message ERROR] {type(e).__name__}: {e}")
-            import traceback
-            traceback.print_exc()
+                self._enqueue_log(log_embed)
+        except Exception:
+            logger.exception("on_message failure")
 
     @commands.Cog.listener()
     async def on_raw_reaction_add(self, payload: discord.RawReactionActionEvent):
@@ -117,8 +236,7 @@ class MessageHandler(commands.Cog):
             return
 
         # Only process reactions in allowed channels (if configured)
-        allowed = getattr(self.bot, 'allowed_channel_ids', None)
-        if allowed is not None and payload.channel_id not in allowed:
+        if not self._channel_allowed(payload.channel_id):
             return
 
         # Only process checkmark reactions
@@ -130,6 +248,10 @@ class MessageHandler(commands.Cog):
         if channel is None:
             return
 
+        # Resolve the engager's mention once; a raw <@id> renders the same, so no fetch_user
+        engager = payload.member or (channel.guild.get_member(payload.user_id) if channel.guild else None)
+        engager_mention = engager.mention if engager else f"<@{payload.user_id}>"
+
         try:
             message = await channel.fetch_message(payload.message_id)
         except Exception:
@@ -137,102 +259,61 @@ class MessageHandler(commands.Cog):
 
         try:
             # Find whose content this is
-            content_owner_session = None
-            if message.embeds:
-                # Get the original message ID
-                message_id = message.id
-                
-                # Try to find the session by message ID more efficiently
-                guild_members = [member.id async for member in channel.guild.fetch_members()]
-                for user_id in guild_members:
-                    session = await self.bot.db.get_active_session(user_id)
-                    if session and session.get("message_id") == message_id:
-                        content_owner_session = session
-                        break
-                        
+            content_owner_session = await self.bot.db.get_session_by_message_id(payload.message_id)
             if not content_owner_session:
-                print(f"Debug - Could not find content owner for message {message.id}")
+                logger.info("Could not find content owner for message %s", message.id)
                 return
 
             # Don't let users react to their own content
             if payload.user_id == content_owner_session["user_id"]:
                 try:
-                    user = channel.guild.get_member(payload.user_id) if channel.guild else None
-                    if user is None:
-                        user = await self.bot.fetch_user(payload.user_id)
-                    await message.remove_reaction(payload.emoji, user)
-                    await channel.send(
-                        f"{user.mention} You cannot engage with your own content! Please engage with others' content instead.",
-                        delete_after=5
+                    await asyncio.gather(
+                        message.remove_reaction(payload.emoji, discord.Object(id=payload.user_id)),
+                        channel.send(
+                            f"{engager_mention} You cannot engage with your own content! Please engage with others' content instead.",
+                            delete_after=5
+                        ),
                     )
                 except Exception as e:
-                    print(f"Debug - Error handling self-reaction: {str(e)}")
+                    logger.warning("Error handling self-reaction: %s", e)
                 return
                 
-        except Exception as e:
-            print(f"Debug - Error in content owner check: {str(e)}")
+        except Exception:
+            logger.exception("Error in content owner check")
             return
 
         try:
             # Record the engagement and award points to the engaging user
             if not content_owner_session.get("session_id"):
-                print(f"Debug - content_owner_session data: {content_owner_session}")
+                logger.warning("Session without session_id: %s", content_owner_session)
                 return
 
-            # Check if user has already engaged
-            if await self.bot.db.has_engaged(payload.user_id, content_owner_session["session_id"]):
+            # Record the engagement and award the point in one transaction; False means a duplicate
+            if not await self.bot.db.record_engagement_and_point(payload.user_id, content_owner_session["session_id"]):
                 try:
                     # Remove the duplicate reaction
-                    user = channel.guild.get_member(payload.user_id) if channel.guild else None
-                    if user is None:
-                        user = await self.bot.fetch_user(payload.user_id)
-                    await message.remove_reaction(payload.emoji, user)
-                    await channel.send(
-                        f"{user.mention} You have already engaged with this content!",
-                        delete_after=5
+                    await asyncio.gather(
+                        message.remove_reaction(payload.emoji, discord.Object(id=payload.user_id)),
+                        channel.send(
+                            f"{engager_mention} You have already engaged with this content!",
+                            delete_after=5
+                        ),
                     )
                 except Exception as e:
-                    print(f"Debug - Error removing duplicate reaction: {str(e)}")
+                    logger.warning("Error removing duplicate reaction: %s", e)
                 return
-                
-            # Add new engagement
-            if await self.bot.db.add_engagement(payload.user_id, content_owner_session["session_id"]):
-                await self.bot.db.add_point(payload.user_id)
-                
-                # Get mention for the engaging user
-                try:
-                    member = channel.guild.get_member(payload.user_id) if channel.guild else None
-                    engager_mention = member.mention if member else (await self.bot.fetch_user(payload.user_id)).mention
-                except Exception as e:
-                    print(f"Debug - Error getting user mention: {str(e)}")
-                    engager_mention = f"<@{payload.user_id}>"
-        except Exception as e:
-            print(f"Debug - Error in engagement recording: {str(e)}")
+
+            # Keep the /status cache in sync (only if the session is already cached)
+            cached = self.bot.engagers_cache.get(content_owner_session["session_id"])
+            if cached is not None:
+                cached.add(payload.user_id)
+        except Exception:
+            logger.exception("Error in engagement recording")
             return
 
-        # Update embed to show the engagement
+        # Update embed to show the engagement (debounced per post)
         if message.embeds:
-            embed = message.embeds[0]
-            try:
-                # Find existing engagements field or create new one
-                engagement_index = -1
-                for i, field in enumerate(embed.fields):
-                    if field.name == "Engaged By":
-                        engagement_index = i
-                        break
-
-                if engagement_index >= 0:
-                    # Update existing field
-                    current_value = embed.fields[engagement_index].value
-                    new_value = f"{current_value}\n{engager_mention}"
-                    embed.set_field_at(engagement_index, name="Engaged By", value=new_value, inline=False)
-                else:
-                    # Add new field
-                    embed.add_field(name="Engaged By", value=engager_mention, inline=False)
-
-                await message.edit(embed=embed)
-            except Exception:
-                pass
+            self._queue_embed_update(channel, message.id, engager_mention)
 
         # Log the engagement
         log_channel = self.bot.get_channel(self.bot.log_channel_id)
@@ -249,7 +330,7 @@ class MessageHandler(commands.Cog):
                 color=discord.Color.green(),
             )
             log_embed.add_field(name="Points Earned", value="1 point", inline=True)
-            await log_channel.send(embed=log_embed)
+            self._enqueue_log(log_embed)
 
 
 async def setup(bot: commands.Bot):